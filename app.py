@@ -1,81 +1,203 @@
 import gradio as gr
 import zipfile
 import io
+import os
+import hashlib
+import pickle
 from datetime import datetime
 import re
-from collections import Counter
+import threading
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 
-try:
-    from docx import Document
-    import PyPDF2
-except ImportError:
-    print("Missing dependencies")
+from extractors import analyze_file, trigrams
+
+# Processed documents are cached on disk by content hash so re-uploads skip extraction.
+# Bump CACHE_VERSION whenever extraction or analysis output changes.
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+CACHE_VERSION = 5
+
+# Upper bound on concurrent file extractions
+MAX_WORKERS = min(8, os.cpu_count() or 1)
+
+# Rendered results kept for the most recent queries; cleared whenever documents change
+RESULT_CACHE_SIZE = 128
+
+# Largest single upload Gradio will accept; bigger files are rejected before processing
+MAX_FILE_SIZE = "100mb"
 
 class DocumentSearch:
     def __init__(self):
-        self.documents = []
         self.metadata = []
+        self.trigram_index = {}
+        self.result_cache = OrderedDict()
+        # Guards swapping the corpus so searches always see a matching set of all three
+        self.corpus_lock = threading.Lock()
+    
+    def _file_digest(self, file):
+        """Hash the raw file bytes"""
+        digest = hashlib.sha256()
+        with open(file.name, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+    
+    def _cache_path(self, digest):
+        """Cache file for a content hash"""
+        return os.path.join(CACHE_DIR, f"{digest}.v{CACHE_VERSION}.pkl")
     
-    def extract_text(self, file):
-        """Extract text from PDF or DOCX"""
+    def _load_cached(self, digest):
+        """Load a processed document from the disk cache"""
         try:
-            if file.name.lower().endswith('.pdf'):
-                reader = PyPDF2.PdfReader(file)
-                return " ".join([page.extract_text() or "" for page in reader.pages])
-            elif file.name.lower().endswith('.docx'):
-                doc = Document(file)
-                return " ".join([p.text for p in doc.paragraphs if p.text])
+            with open(self._cache_path(digest), 'rb') as f:
+                return pickle.load(f)
+        except Exception:
+            return None
+    
+    def _save_cached(self, digest, entry):
+        """Write a processed document to the disk cache"""
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            path = self._cache_path(digest)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
         except Exception as e:
-            return f"Error: {str(e)}"
-        return ""
+            print(f"Cache write failed: {str(e)}")
     
     def process_files(self, files):
         """Process uploaded files"""
-        self.documents = []
-        self.metadata = []
+        # Build the new corpus off to the side; searches keep using the old one until the swap
+        metadata = []
+        trigram_index = {}
+        skipped = 0
+        failed = 0
+        duplicates = 0
         
+        # Identical uploads are extracted and indexed only once
+        unique_files = []
+        digests = []
+        seen = set()
         for file in files:
-            text = self.extract_text(file)
-            if text and not text.startswith("Error") and len(text) > 10:
-                words = len(re.findall(r'\w+', text))
-                sentences = len([s for s in re.split(r'[.!?]+', text) if s.strip()])
-                
-                self.metadata.append({
-                    'filename': file.name,
-                    'word_count': words,
-                    'sentence_count': sentences,
-                    'content': text
-                })
-                self.documents.append(text)
-        
-        return f"✅ Processed {len(self.documents)} documents"
+            digest = self._file_digest(file)
+            if digest in seen:
+                duplicates += 1
+                continue
+            seen.add(digest)
+            unique_files.append(file)
+            digests.append(digest)
+        
+        entries = [self._load_cached(digest) for digest in digests]
+        misses = [i for i, entry in enumerate(entries) if entry is None]
+        
+        # PyPDF2 is pure Python and PDFium is single-threaded, so extract cache misses
+        # in separate processes; a lone file is not worth starting a pool for
+        paths = [unique_files[i].name for i in misses]
+        if len(paths) > 1:
+            with ProcessPoolExecutor(max_workers=min(MAX_WORKERS, len(paths))) as executor:
+                extracted = list(executor.map(analyze_file, paths))
+        else:
+            extracted = [analyze_file(path) for path in paths]
+        
+        for i, entry in zip(misses, extracted):
+            entries[i] = entry
+            # Parse failures are not cached, so a fixed parser gets another try
+            if entry is not None and 'error' not in entry:
+                self._save_cached(digests[i], entry)
+        
+        for file, entry in zip(unique_files, entries):
+            if entry is None:
+                skipped += 1
+                continue
+            if 'error' in entry:
+                print(f"Failed to extract {file.name}: {entry['error']}")
+                failed += 1
+                continue
+            
+            # Inverted trigram index: any document containing a query contains all of its
+            # trigrams. Per-document sets come precomputed from extraction or the disk cache,
+            # so only the merge runs here. The postings cost roughly 3-4x the size of the
+            # indexed text in memory, traded for skipping non-matching documents per query.
+            doc_id = len(metadata)
+            for gram in entry['trigrams']:
+                trigram_index.setdefault(gram, set()).add(doc_id)
+            
+            metadata.append({
+                'filename': file.name,
+                'word_count': entry['word_count'],
+                'sentence_count': entry['sentence_count'],
+                'content': entry['content'],
+                # Lowercased once here so each query confirms candidates with a plain substring test
+                'content_lower': entry['content'].lower()
+            })
+        
+        with self.corpus_lock:
+            self.metadata = metadata
+            self.trigram_index = trigram_index
+            self.result_cache = OrderedDict()
+        
+        status = f"✅ Processed {len(metadata)} documents"
+        if skipped:
+            status += f"\n⚠️ Skipped {skipped} file(s) with no extractable text (scanned PDFs need OCR)"
+        if failed:
+            status += f"\n❌ Could not read {failed} file(s); they may be corrupt or not valid PDF/DOCX"
+        if duplicates:
+            status += f"\n⚠️ Skipped {duplicates} duplicate file(s)"
+        return status
+    
+    def _candidate_docs(self, query_lower, metadata, trigram_index):
+        """Ids of documents that may contain the query, in upload order"""
+        grams = trigrams(query_lower)
+        if not grams:
+            return range(len(metadata))
+        
+        postings = sorted((trigram_index.get(gram, set()) for gram in grams), key=len)
+        return sorted(postings[0].intersection(*postings[1:]))
     
     def search_documents(self, query):
         """Search through documents"""
-        if not self.documents or not query:
+        # One consistent snapshot: a concurrent upload cannot mix corpora or poison its cache
+        with self.corpus_lock:
+            metadata, trigram_index, result_cache = self.metadata, self.trigram_index, self.result_cache
+            cached = result_cache.get(query)
+            if cached is not None:
+                result_cache.move_to_end(query)
+        
+        if not metadata or not query:
             return "No documents or query provided"
         
+        if cached is not None:
+            return cached
+        
         results = []
         query_lower = query.lower()
+        # Compiled once per query; only used to highlight the preview
+        pattern = re.compile(re.escape(query), re.IGNORECASE)
         
-        for i, (doc, meta) in enumerate(zip(self.documents, self.metadata)):
-            if query_lower in doc.lower():
-                # Simple highlighting
-                highlighted = doc.replace(query, f"**{query}**")
-                results.append(f"📄 {meta['filename']} ({meta['word_count']} words)\n{highlighted[:500]}...")
+        for i in self._candidate_docs(query_lower, metadata, trigram_index):
+            meta = metadata[i]
+            if query_lower in meta['content_lower']:
+                # Only the preview is shown, so only the preview is highlighted
+                highlighted = pattern.sub(r"**\g<0>**", meta['content'][:500])
+                results.append(f"📄 {meta['filename']} ({meta['word_count']} words)\n{highlighted}...")
         
-        if results:
-            return "\n\n".join(results)
-        else:
-            return "No matches found"
+        output = "\n\n".join(results) if results else "No matches found"
+        with self.corpus_lock:
+            result_cache[query] = output
+            result_cache.move_to_end(query)
+            if len(result_cache) > RESULT_CACHE_SIZE:
+                result_cache.popitem(last=False)
+        return output
     
     def get_stats(self):
         """Get document statistics"""
-        if not self.metadata:
+        metadata = self.metadata
+        if not metadata:
             return "No documents loaded"
         
-        total_docs = len(self.metadata)
-        total_words = sum(m['word_count'] for m in self.metadata)
+        total_docs = len(metadata)
+        total_words = sum(m['word_count'] for m in metadata)
         avg_words = total_words // total_docs if total_docs > 0 else 0
         
         return f"Documents: {total_docs}\nTotal Words: {total_words}\nAverage: {avg_words} words/doc"
@@ -122,4 +244,4 @@ with gr.Blocks(title="MeetSearch Pro", theme=gr.themes.Soft()) as demo:
 
 # Launch the app
 if __name__ == "__main__":
-    demo.launch(share=True)
\ No newline at end of file
+    demo.launch(share=True, max_file_size=MAX_FILE_SIZE)
\ No newline at end of file
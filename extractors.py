@@ -0,0 +1,125 @@
+"""Text extraction and analysis for uploaded documents.
+
+Kept free of Gradio and search state so worker processes can import it cheaply.
+"""
+import re
+import zipfile
+
+try:
+    from lxml import etree
+    import PyPDF2
+except ImportError:
+    print("Missing dependencies")
+
+try:
+    import pypdfium2 as pdfium
+except ImportError:
+    pdfium = None
+
+# Scanned PDFs have no text layer; give up after this many empty pages in a row
+EMPTY_PAGE_LIMIT = 5
+
+# WordprocessingML run content that carries paragraph text, mapped the way python-docx
+# reads it. Only children of a run count: w:tab also appears as a tab-stop definition.
+W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+DOCX_BREAKS = {W_NS + "tab": "\t", W_NS + "ptab": "\t", W_NS + "cr": "\n", W_NS + "noBreakHyphen": "-"}
+
+# Text analysis patterns, compiled once. A sentence is a run between [.!?] terminators
+# that contains a non-space character, so counting matches needs no split/strip pass.
+WORD_RE = re.compile(r'\w+')
+SENTENCE_RE = re.compile(r'[^.!?\s][^.!?]*')
+
+def trigrams(text):
+    """Distinct 3-character substrings of text"""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+def join_pages(page_texts):
+    """Join page texts, stopping early on image-only scans"""
+    pages = []
+    total_chars = 0
+    empty_streak = 0
+    for page_text in page_texts:
+        pages.append(page_text)
+        total_chars += len(page_text)
+        empty_streak = 0 if page_text.strip() else empty_streak + 1
+        if empty_streak >= EMPTY_PAGE_LIMIT and total_chars < 200:
+            break
+    return " ".join(pages)
+
+def pdfium_page_texts(pdf):
+    """Yield the text of each page of a PDFium document"""
+    for page in pdf:
+        textpage = page.get_textpage()
+        try:
+            yield textpage.get_text_range()
+        finally:
+            textpage.close()
+            page.close()
+
+def extract_pdf_text(path):
+    """Extract PDF text with PDFium, falling back to PyPDF2"""
+    if pdfium is not None:
+        pdf = pdfium.PdfDocument(path)
+        try:
+            return join_pages(pdfium_page_texts(pdf))
+        finally:
+            pdf.close()
+    
+    reader = PyPDF2.PdfReader(path, strict=False)
+    return join_pages(page.extract_text() or "" for page in reader.pages)
+
+def extract_docx_text(path):
+    """Stream paragraph text straight out of word/document.xml"""
+    paragraphs = []
+    runs = []
+    with zipfile.ZipFile(path) as archive, archive.open("word/document.xml") as xml:
+        tags = (W_NS + "t", W_NS + "br", W_NS + "p", *DOCX_BREAKS)
+        # Uploads are untrusted: never expand entities or fetch external DTDs
+        for _, element in etree.iterparse(xml, tag=tags, resolve_entities=False, no_network=True):
+            if element.tag == W_NS + "p":
+                text = "".join(runs)
+                if text:
+                    paragraphs.append(text)
+                runs = []
+                element.clear()
+            elif element.getparent().tag != W_NS + "r":
+                continue
+            elif element.tag == W_NS + "t":
+                runs.append(element.text or "")
+            elif element.tag == W_NS + "br":
+                # Page and column breaks carry no text; only line breaks do
+                if element.get(W_NS + "type", "textWrapping") == "textWrapping":
+                    runs.append("\n")
+            else:
+                runs.append(DOCX_BREAKS[element.tag])
+    return " ".join(paragraphs)
+
+def extract_text(path):
+    """Extract text from PDF or DOCX; parser errors propagate to the caller"""
+    if path.lower().endswith('.pdf'):
+        return extract_pdf_text(path)
+    elif path.lower().endswith('.docx'):
+        return extract_docx_text(path)
+    return ""
+
+def analyze_file(path):
+    """Extract and count one file.
+    
+    Returns the document entry, None if the file has no usable text, or
+    {'error': message} if it could not be parsed. The entry carries the
+    lowercased text's trigram set so the search index can be merged from
+    cached entries instead of re-scanning every document.
+    """
+    try:
+        text = extract_text(path)
+    except Exception as e:
+        return {'error': str(e)}
+    if not text or len(text) <= 10:
+        return None
+    
+    return {
+        'word_count': len(WORD_RE.findall(text)),
+        'sentence_count': len(SENTENCE_RE.findall(text)),
+        'content': text,
+        'trigrams': trigrams(text.lower())
+    }